@@ -1,6 +1,5 @@
 from flask import Flask, send_from_directory
 from flask_cors import CORS
-from flask_session import Session
 from routes.connection import connection_bp
 from routes.query import query_bp
 from routes.compare import compare_bp
@@ -12,10 +11,10 @@ app.config.from_object(DevelopmentConfig)
 # Enable CORS for React frontend
 CORS(app, origins=['http://localhost:3000'], supports_credentials=True)
 
-# Configure session for connection storage
-app.config['SESSION_TYPE'] = 'filesystem'
+# Connection params live in Flask's default signed session cookie: the
+# payload is a small dict (password stored Fernet-encrypted), so no
+# per-request filesystem read is needed
 app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HTTPS
-Session(app)
 
 # Register blueprints
 app.register_blueprint(connection_bp)
@@ -26,5 +25,7 @@ app.register_blueprint(compare_bp)
 def health_check():
     return {"status": "healthy"}
 
+# Development server only -- production runs under gunicorn via wsgi.py
+# (see README), where threaded workers let pyodbc fetches overlap
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
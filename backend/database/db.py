@@ -1,35 +1,133 @@
-import pyodbc
-from flask import current_app, g
-
-def get_db_connection(connection_params):
-    """Create database connection with provided parameters"""
-    try:
-        conn_str = (
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={connection_params['server']};"
-            f"DATABASE={connection_params['database']};"
-            f"UID={connection_params['username']};"
-            f"PWD={connection_params['password']}"
-        )
-        
-        if connection_params.get('trusted_connection'):
-            conn_str = (
-                f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-                f"SERVER={connection_params['server']};"
-                f"DATABASE={connection_params['database']};"
-                f"Trusted_Connection=yes;"
-            )
-            
-        conn = pyodbc.connect(conn_str, timeout=10)
-        return conn
-    except Exception as e:
-        raise Exception(f"Connection failed: {str(e)}")
-
-def test_connection(connection_params):
-    """Test database connection"""
-    try:
-        conn = get_db_connection(connection_params)
-        conn.close()
-        return {"status": "success", "message": "Connected successfully"}
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
+import pyodbc
+import queue
+import threading
+from contextlib import contextmanager
+
+from utils.crypto import decrypt_password
+
+# Enable the ODBC driver manager's connection pooling so physical sessions
+# survive pyodbc.Connection.close(). For unixODBC, pairing this with
+# Pooling=Yes / CPTimeout=120 in odbcinst.ini keeps idle sessions warm.
+pyodbc.pooling = True
+
+# Process-wide pool of idle connections keyed by connection string.
+# LIFO so the most recently used (warmest) connection is handed out first.
+_POOL_MAX_SIZE = 10
+_pool_lock = threading.Lock()
+_pools = {}
+
+
+# Pre-compiled connection-string templates; only the auth fragment differs
+_TRUSTED_TEMPLATE = (
+    "DRIVER={{ODBC Driver 17 for SQL Server}};"
+    "SERVER={server};DATABASE={database};Trusted_Connection=yes;"
+)
+_SQL_AUTH_TEMPLATE = (
+    "DRIVER={{ODBC Driver 17 for SQL Server}};"
+    "SERVER={server};DATABASE={database};UID={username};PWD={password}"
+)
+
+# Built connection strings cached by parameter identity, so repeat requests
+# skip string construction (and password decryption) entirely. Encrypted
+# passwords make the cache key unique per login session (Fernet tokens are
+# nondeterministic), so both this cache and the pool map are bounded:
+# beyond the limit the oldest entry is evicted, keeping a long-lived
+# worker from accumulating plaintext connection strings without end.
+_CACHE_MAX_ENTRIES = 32
+_conn_str_cache = {}
+
+def _conn_key(connection_params):
+    """Hashable identity of a set of connection parameters"""
+    return (
+        connection_params['server'],
+        connection_params['database'],
+        connection_params.get('username', ''),
+        connection_params.get('password', ''),
+        bool(connection_params.get('trusted_connection'))
+    )
+
+def _build_conn_str(connection_params):
+    """Build (and cache) the ODBC connection string for these parameters"""
+    key = _conn_key(connection_params)
+    conn_str = _conn_str_cache.get(key)
+    if conn_str is None:
+        server, database, username, password, trusted = key
+        if trusted:
+            conn_str = _TRUSTED_TEMPLATE.format(server=server, database=database)
+        else:
+            conn_str = _SQL_AUTH_TEMPLATE.format(
+                server=server,
+                database=database,
+                username=username,
+                password=decrypt_password(password)
+            )
+        # Evict and insert under the lock: concurrent requests racing the
+        # eviction would otherwise pop the same oldest key
+        with _pool_lock:
+            if len(_conn_str_cache) >= _CACHE_MAX_ENTRIES:
+                _conn_str_cache.pop(next(iter(_conn_str_cache)), None)
+            _conn_str_cache[key] = conn_str
+    return conn_str
+
+
+def _get_pool(conn_str):
+    """Get or create the idle-connection queue for a connection string"""
+    with _pool_lock:
+        pool = _pools.get(conn_str)
+        if pool is None:
+            if len(_pools) >= _CACHE_MAX_ENTRIES:
+                stale = _pools.pop(next(iter(_pools)))
+                while True:
+                    try:
+                        stale.get_nowait().close()
+                    except queue.Empty:
+                        break
+                    except pyodbc.Error:
+                        pass
+            pool = _pools[conn_str] = queue.LifoQueue(maxsize=_POOL_MAX_SIZE)
+        return pool
+
+
+@contextmanager
+def get_db_connection(connection_params):
+    """Borrow a pooled database connection for the duration of a with-block
+
+    Reuses an idle connection opened with the same parameters when one is
+    available, otherwise opens a new one. On clean exit the connection is
+    rolled back and returned to the pool; on error it is closed instead.
+    """
+    try:
+        conn_str = _build_conn_str(connection_params)
+    except (KeyError, TypeError, AttributeError):
+        raise Exception("Connection failed: missing connection parameters")
+
+    pool = _get_pool(conn_str)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        try:
+            conn = pyodbc.connect(conn_str, timeout=10)
+        except Exception as e:
+            raise Exception(f"Connection failed: {str(e)}")
+
+    try:
+        yield conn
+    except Exception:
+        conn.close()
+        raise
+    else:
+        try:
+            conn.rollback()
+            pool.put_nowait(conn)
+        except (pyodbc.Error, queue.Full):
+            conn.close()
+
+
+def test_connection(connection_params):
+    """Test database connection"""
+    try:
+        with get_db_connection(connection_params):
+            pass
+        return {"status": "success", "message": "Connected successfully"}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
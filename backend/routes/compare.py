@@ -1,4 +1,5 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, Response
+import orjson
 from services.comparator import compare_queries
 
 compare_bp = Blueprint('compare', __name__)
@@ -20,6 +21,15 @@ def compare_query_results():
             mappings,
             primary_keys
         )
-        return jsonify(result)
+        # orjson encodes NumPy scalars and pandas Timestamps in C, so the
+        # large matches/mismatches payloads skip Flask's stdlib encoder
+        return Response(
+            orjson.dumps(
+                result,
+                option=orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY,
+                default=str
+            ),
+            mimetype='application/json'
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify, session
 from database.db import test_connection
+from utils.crypto import encrypt_password
 
 connection_bp = Blueprint('connection', __name__)
 
@@ -7,9 +8,13 @@ connection_bp = Blueprint('connection', __name__)
 def test_database_connection():
     """Test database connection"""
     data = request.json
-    
-    # Store in session temporarily (encrypt in production)
-    session['db_connection'] = data
-    
+
+    # Store in the signed session cookie with the password encrypted so
+    # the cookie is useless if intercepted
+    stored = dict(data)
+    if stored.get('password'):
+        stored['password'] = encrypt_password(stored['password'])
+    session['db_connection'] = stored
+
     result = test_connection(data)
     return jsonify(result)
@@ -17,19 +17,18 @@ def execute_query():
         return jsonify({"error": error}), 400
     
     try:
-        conn = get_db_connection(session.get('db_connection'))
-        cursor = conn.cursor()
-        cursor.execute(query)
-        
-        # Get column names
-        columns = [column[0] for column in cursor.description]
-        
-        # Fetch results (limit rows)
-        rows = cursor.fetchmany(1000)
-        
-        cursor.close()
-        conn.close()
-        
+        with get_db_connection(session.get('db_connection')) as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+
+            # Get column names
+            columns = [column[0] for column in cursor.description]
+
+            # Fetch results (limit rows)
+            rows = cursor.fetchmany(1000)
+
+            cursor.close()
+
         return jsonify({
             "columns": columns,
             "rows": rows,
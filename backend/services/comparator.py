@@ -1,90 +1,496 @@
-from database.db import get_db_connection
-import pandas as pd
-from datetime import datetime
-
-def compare_queries(connection_params, query1, query2, mappings, primary_keys):
-    """Compare results of two SQL queries"""
-    start_time = datetime.now()
-    
-    # Execute queries
-    conn = get_db_connection(connection_params)
-    
-    df1 = pd.read_sql(query1, conn)
-    df2 = pd.read_sql(query2, conn)
-    
-    conn.close()
-    
-    # Prepare mapping dictionary
-    mapping_dict = {}
-    for m in mappings:
-        mapping_dict[m['left']] = m['right']
-    
-    # Reverse mapping for result display
-    reverse_map = {v: k for k, v in mapping_dict.items()}
-    
-    # Rename columns in df2 to match df1
-    df2_renamed = df2.rename(columns=mapping_dict)
-    
-    # Identify common columns for comparison
-    common_columns = [col for col in df1.columns if col in df2_renamed.columns]
-    
-    # Determine join keys (primary keys)
-    join_keys = primary_keys if primary_keys else common_columns[:1]
-    
-    # Perform comparison
-    merged = pd.merge(
-        df1, 
-        df2_renamed, 
-        on=join_keys, 
-        how='outer', 
-        suffixes=('_query1', '_query2'),
-        indicator=True
-    )
-    
-    # Categorize results
-    matches = merged[merged['_merge'] == 'both']
-    only_query1 = merged[merged['_merge'] == 'left_only']
-    only_query2 = merged[merged['_merge'] == 'right_only']
-    
-    # Compare values in matches
-    mismatches = []
-    for idx, row in matches.iterrows():
-        row_mismatches = {}
-        for col in common_columns:
-            if col not in join_keys:
-                val1 = row[f"{col}_query1"]
-                val2 = row[f"{col}_query2"]
-                if str(val1) != str(val2):
-                    row_mismatches[col] = {
-                        "query1": val1,
-                        "query2": val2
-                    }
-        if row_mismatches:
-            mismatches.append({
-                "key": {k: row[k] for k in join_keys},
-                "differences": row_mismatches
-            })
-    
-    execution_time = (datetime.now() - start_time).total_seconds()
-    
-    # Format results
-    return {
-        "summary": {
-            "total_rows_query1": len(df1),
-            "total_rows_query2": len(df2),
-            "matches": len(matches),
-            "only_in_query1": len(only_query1),
-            "only_in_query2": len(only_query2),
-            "mismatches": len(mismatches),
-            "execution_time": round(execution_time, 2)
-        },
-        "matches": matches.head(100).to_dict('records') if not matches.empty else [],
-        "only_in_query1": only_query1.head(100).to_dict('records') if not only_query1.empty else [],
-        "only_in_query2": only_query2.head(100).to_dict('records') if not only_query2.empty else [],
-        "mismatches": mismatches[:100],
-        "columns": {
-            "query1": df1.columns.tolist(),
-            "query2": df2.columns.tolist(),
-            "mapped": common_columns
-        }
-    }
+from database.db import get_db_connection, _build_conn_str
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+import numpy as np
+import pandas as pd
+import re
+import sqlparse
+from datetime import datetime
+
+from config import Config
+
+# turbodbc fetches straight into columnar Arrow buffers, skipping the
+# row-by-row DBAPI path entirely; it stays optional
+try:
+    import turbodbc
+    _HAS_TURBODBC = True
+except ImportError:
+    _HAS_TURBODBC = False
+
+FETCH_BATCH_SIZE = 5000
+
+# Row-cap injection: skip queries whose outer statement already limits
+# itself, and only rewrite ones that start with a plain SELECT
+_SELECT_HEAD_RE = re.compile(r'^(\s*SELECT(?:\s+DISTINCT|\s+ALL)?)\b', re.IGNORECASE)
+
+def _has_row_limit(statement):
+    """Detect TOP or OFFSET/FETCH on the outer statement itself
+
+    Only the statement's top-level tokens are inspected: TOP can only
+    follow the outer SELECT (sqlparse folds it into the first identifier
+    group), and OFFSET/FETCH surface as top-level keywords. The same
+    words inside subqueries or string literals stay nested in groups, so
+    they do not disable the cap.
+    """
+    seen_select = False
+    for token in statement.tokens:
+        if token.is_whitespace:
+            continue
+        if token.ttype is sqlparse.tokens.Keyword.DML:
+            seen_select = True
+            continue
+        if seen_select:
+            # Split on '(' as well as whitespace so TOP(10) is caught
+            head = re.split(r'[\s(]', str(token), 1)[0].upper()
+            if head in ('DISTINCT', 'ALL'):
+                continue
+            if head == 'TOP':
+                return True
+            seen_select = False
+        if (not token.is_group
+                and token.ttype is sqlparse.tokens.Keyword
+                and token.normalized in ('OFFSET', 'FETCH')):
+            return True
+    return False
+
+def _inject_top(query, n):
+    """Cap a SELECT at n rows by injecting TOP (n) after the outer SELECT
+
+    Queries whose outer statement already carries TOP or OFFSET/FETCH, or
+    that are not plain SELECT statements, are returned unchanged.
+    """
+    statements = sqlparse.parse(query)
+    if not statements or statements[0].get_type() != 'SELECT':
+        return query
+    if _has_row_limit(statements[0]):
+        return query
+    return _SELECT_HEAD_RE.sub(rf'\1 TOP ({n})', query, count=1)
+
+def _max_rows():
+    """Configured comparison row cap, app config when available"""
+    try:
+        return current_app.config['MAX_ROWS_COMPARISON']
+    except RuntimeError:
+        return Config.MAX_ROWS_COMPARISON
+
+def _is_cte_composable(query):
+    """Check whether a query can be embedded as a CTE body
+
+    Only a single plain SELECT qualifies: batches, nested WITH clauses and
+    trailing ORDER BY all break the WITH A AS (...) wrapping.
+    """
+    statements = [s for s in sqlparse.parse(query) if str(s).strip()]
+    if len(statements) != 1:
+        return False
+    statement = statements[0]
+    if statement.get_type() != 'SELECT':
+        return False
+    normalized = str(statement).upper()
+    if normalized.lstrip().startswith('WITH'):
+        return False
+    if 'ORDER BY' in normalized:
+        return False
+    if ';' in normalized.rstrip().rstrip(';'):
+        return False
+    return True
+
+def _build_comparison_sql(query1, query2, key_pairs, value_pairs):
+    """Compose a single statement that joins and categorizes both queries
+
+    Wraps the two queries as CTEs, FULL OUTER JOINs them on the primary
+    keys and has the server compute a per-row category plus per-column
+    diff flags, so no client-side merge is needed at all.
+    """
+    on_clause = " AND ".join(f"A.[{l}] = B.[{r}]" for l, r in key_pairs)
+    a_missing = " AND ".join(f"A.[{l}] IS NULL" for l, _ in key_pairs)
+    b_missing = " AND ".join(f"B.[{r}] IS NULL" for _, r in key_pairs)
+
+    # NULL-safe inequality per compared column pair
+    diff_exprs = {
+        l: (
+            f"(A.[{l}] <> B.[{r}]"
+            f" OR (A.[{l}] IS NULL AND B.[{r}] IS NOT NULL)"
+            f" OR (A.[{l}] IS NOT NULL AND B.[{r}] IS NULL))"
+        )
+        for l, r in value_pairs
+    }
+
+    if diff_exprs:
+        mismatch_branch = f"WHEN {' OR '.join(diff_exprs.values())} THEN 'mismatch' "
+    else:
+        mismatch_branch = ""
+
+    select_parts = [
+        f"CASE WHEN {a_missing} THEN 'right_only' "
+        f"WHEN {b_missing} THEN 'left_only' "
+        f"{mismatch_branch}ELSE 'both' END AS [_category]"
+    ]
+    for l, r in key_pairs:
+        select_parts.append(f"COALESCE(A.[{l}], B.[{r}]) AS [{l}]")
+    for l, r in value_pairs:
+        select_parts.append(f"A.[{l}] AS [{l}_query1]")
+        select_parts.append(f"B.[{r}] AS [{l}_query2]")
+        select_parts.append(f"CASE WHEN {diff_exprs[l]} THEN 1 ELSE 0 END AS [{l}_diff]")
+
+    # Each closing paren goes on its own line so a query ending in a
+    # trailing -- comment cannot comment out the rest of the statement
+    return (
+        f"WITH A AS ({query1.rstrip().rstrip(';')}\n), "
+        f"B AS ({query2.rstrip().rstrip(';')}\n)\n"
+        f"SELECT {', '.join(select_parts)}\n"
+        f"FROM A FULL OUTER JOIN B ON {on_clause}"
+    )
+
+def _compare_in_sql(connection_params, query1, query2, key_pairs, value_pairs):
+    """Run the comparison server-side and stream back categorized rows"""
+    sql = _build_comparison_sql(query1, query2, key_pairs, value_pairs)
+    key_cols = [l for l, _ in key_pairs]
+    value_cols = [l for l, _ in value_pairs]
+
+    counts = {"both": 0, "mismatch": 0, "left_only": 0, "right_only": 0}
+    matches = []
+    only_query1 = []
+    only_query2 = []
+    mismatches = []
+
+    with get_db_connection(connection_params) as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        columns = [d[0] for d in cursor.description]
+        while True:
+            batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not batch:
+                break
+            for row in batch:
+                record = dict(zip(columns, row))
+                category = record.pop('_category')
+                counts[category] += 1
+                if category in ('both', 'mismatch'):
+                    if len(matches) < 100:
+                        matches.append({
+                            k: v for k, v in record.items()
+                            if not k.endswith('_diff')
+                        })
+                    if category == 'mismatch' and len(mismatches) < 100:
+                        mismatches.append({
+                            "key": {k: record[k] for k in key_cols},
+                            "differences": {
+                                c: {
+                                    "query1": record[f"{c}_query1"],
+                                    "query2": record[f"{c}_query2"]
+                                }
+                                for c in value_cols if record[f"{c}_diff"]
+                            }
+                        })
+                elif category == 'left_only':
+                    if len(only_query1) < 100:
+                        only_query1.append({
+                            k: v for k, v in record.items()
+                            if not k.endswith('_diff')
+                        })
+                else:
+                    if len(only_query2) < 100:
+                        only_query2.append({
+                            k: v for k, v in record.items()
+                            if not k.endswith('_diff')
+                        })
+        cursor.close()
+
+    matched = counts['both'] + counts['mismatch']
+    return {
+        "summary": {
+            "total_rows_query1": matched + counts['left_only'],
+            "total_rows_query2": matched + counts['right_only'],
+            "matches": matched,
+            "only_in_query1": counts['left_only'],
+            "only_in_query2": counts['right_only'],
+            "mismatches": counts['mismatch'],
+            "execution_time": 0
+        },
+        "matches": matches,
+        "only_in_query1": only_query1,
+        "only_in_query2": only_query2,
+        "mismatches": mismatches,
+        "columns": {
+            "query1": key_cols + value_cols,
+            "query2": [r for _, r in key_pairs] + [r for _, r in value_pairs],
+            "mapped": key_cols + value_cols
+        }
+    }
+
+def _cursor_to_df(cursor):
+    """Drain the cursor's current result set into a typed DataFrame
+
+    Streams rows in fetchmany batches and transposes them into per-column
+    lists, skipping pandas' generic row-by-row read_sql path and letting
+    NumPy infer a typed array per column.
+    """
+    columns = [d[0] for d in cursor.description]
+    column_data = [[] for _ in columns]
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        for row in batch:
+            for values, value in zip(column_data, row):
+                values.append(value)
+
+    return pd.DataFrame({
+        name: np.asarray(values)
+        for name, values in zip(columns, column_data)
+    })
+
+def _fetch_arrow(connection_params, query):
+    """Fetch a result set through turbodbc's Arrow path
+
+    fetchallarrow() fills columnar C buffers inside the driver and returns
+    a pyarrow.Table; to_pandas with ArrowDtype keeps the columns typed
+    without boxing a Python object per cell.
+    """
+    conn = turbodbc.connect(connection_string=_build_conn_str(connection_params))
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        table = cursor.fetchallarrow()
+        cursor.close()
+    finally:
+        conn.close()
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+def fetch_columnar(connection_params, query):
+    """Execute a query and build a DataFrame column-by-column"""
+    if _HAS_TURBODBC:
+        return _fetch_arrow(connection_params, query)
+    with get_db_connection(connection_params) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        df = _cursor_to_df(cursor)
+        cursor.close()
+    return df
+
+def _is_batchable(query):
+    """Check a query is safe to combine into a multi-statement batch"""
+    return ';' not in query.rstrip().rstrip(';')
+
+def _fetch_batched(connection_params, query1, query2):
+    """Fetch both result sets in one round-trip on a single connection
+
+    Executes the queries as one batch so the server parses and returns
+    both result sets together; the second set is reached via nextset().
+    """
+    with get_db_connection(connection_params) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"{query1.rstrip().rstrip(';')};\n{query2.rstrip().rstrip(';')};"
+        )
+        df1 = _cursor_to_df(cursor)
+        cursor.nextset()
+        df2 = _cursor_to_df(cursor)
+        cursor.close()
+    return df1, df2
+
+def _column_diff_mask(s1, s2):
+    """NaN/NaT-safe elementwise inequality between two aligned columns
+
+    Numeric and datetime columns are compared on their native dtypes, with
+    missing == missing counting as equal (the semantics the old per-cell
+    str() comparison provided); other dtypes fall back to string
+    comparison.
+    """
+    if pd.api.types.is_numeric_dtype(s1) and pd.api.types.is_numeric_dtype(s2):
+        a = s1.to_numpy(dtype='float64', na_value=np.nan)
+        b = s2.to_numpy(dtype='float64', na_value=np.nan)
+        with np.errstate(invalid='ignore'):
+            return (a != b) & ~(np.isnan(a) & np.isnan(b))
+    if (pd.api.types.is_datetime64_any_dtype(s1)
+            and pd.api.types.is_datetime64_any_dtype(s2)):
+        both_missing = s1.isna().to_numpy() & s2.isna().to_numpy()
+        return s1.ne(s2).to_numpy() & ~both_missing
+    return s1.astype(str).to_numpy() != s2.astype(str).to_numpy()
+
+def compare_queries(connection_params, query1, query2, mappings, primary_keys):
+    """Compare results of two SQL queries"""
+    start_time = datetime.now()
+
+    # Enforce the configured row cap server-side so oversized result sets
+    # are cut off by SQL Server before they reach the wire
+    max_rows = _max_rows()
+    query1 = _inject_top(query1, max_rows)
+    query2 = _inject_top(query2, max_rows)
+
+    # Prepare mapping dictionary
+    mapping_dict = {}
+    for m in mappings:
+        mapping_dict[m['left']] = m['right']
+
+    # Reverse mapping for result display
+    reverse_map = {v: k for k, v in mapping_dict.items()}
+
+    # Push the comparison into SQL when the column pairs are known and both
+    # queries can be wrapped as CTEs -- the server's hash/merge join beats
+    # shipping every matching row to pandas
+    if (primary_keys and mappings
+            and _is_cte_composable(query1) and _is_cte_composable(query2)):
+        key_pairs = [(k, reverse_map.get(k, k)) for k in primary_keys]
+        value_pairs = [
+            (m['right'], m['left']) for m in mappings
+            if m['right'] not in primary_keys
+        ]
+        result = _compare_in_sql(
+            connection_params, query1, query2, key_pairs, value_pairs
+        )
+        summary = result["summary"]
+        summary["truncated"] = (summary["total_rows_query1"] >= max_rows
+                                or summary["total_rows_query2"] >= max_rows)
+        summary["execution_time"] = round(
+            (datetime.now() - start_time).total_seconds(), 2
+        )
+        return result
+
+    # Fall back to fetching both result sets and comparing in pandas.
+    # When neither query embeds its own semicolons, batch them into one
+    # statement (single network round-trip); otherwise fetch them
+    # concurrently on two pooled connections -- pyodbc releases the GIL
+    # during fetch, so the queries truly overlap
+    if (not _HAS_TURBODBC
+            and _is_batchable(query1) and _is_batchable(query2)):
+        df1, df2 = _fetch_batched(connection_params, query1, query2)
+    else:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future1 = executor.submit(fetch_columnar, connection_params, query1)
+            future2 = executor.submit(fetch_columnar, connection_params, query2)
+            df1 = future1.result()
+            df2 = future2.result()
+
+    # Relabel df2's columns in place to match df1 -- df2 is local to this
+    # function, so skipping rename's full block-manager copy is safe;
+    # df2_renamed is an alias of df2, not a copy
+    df2.columns = [mapping_dict.get(c, c) for c in df2.columns]
+    df2_renamed = df2
+    
+    # Identify common columns for comparison
+    common_columns = [col for col in df1.columns if col in df2_renamed.columns]
+    
+    # Determine join keys (primary keys)
+    join_keys = primary_keys if primary_keys else common_columns[:1]
+
+    # Object-dtype keys are hashed cell-by-cell during the merge. Factorize
+    # each one across both frames into shared int64 codes, merge on the
+    # codes (vectorized C hash join), and decode back after the merge.
+    # NaN factorizes to -1 on both sides, preserving merge's NaN==NaN
+    # join behavior.
+    key_decoders = {}
+    for k in join_keys:
+        if df1[k].dtype == object and df2_renamed[k].dtype == object:
+            combined = pd.concat([df1[k], df2_renamed[k]], ignore_index=True)
+            codes, uniques = pd.factorize(combined)
+            df1[k] = codes[:len(df1)]
+            df2_renamed[k] = codes[len(df1):]
+            key_decoders[k] = np.asarray(uniques, dtype=object)
+
+    # Perform comparison; sort=False skips an O(n log n) sort of the result
+    # that nothing downstream relies on. Duplicate key values join
+    # many-to-many, the same way the SQL pushdown path treats them.
+    merged = pd.merge(
+        df1,
+        df2_renamed,
+        on=join_keys,
+        how='outer',
+        suffixes=('_query1', '_query2'),
+        indicator=True,
+        sort=False,
+        copy=False
+    )
+
+    # Restore the original key values over the int codes
+    for k, uniques in key_decoders.items():
+        codes = merged[k].to_numpy()
+        if uniques.size:
+            decoded = uniques[np.clip(codes, 0, None)]
+            decoded[codes < 0] = np.nan
+        else:
+            decoded = np.full(len(codes), np.nan, dtype=object)
+        merged[k] = decoded
+    
+    # Categorize results in one pass: _merge is already categorical, so
+    # groupby splits on int codes instead of three full boolean masks
+    parts = dict(tuple(merged.groupby('_merge', observed=True, sort=False)))
+    empty = merged.iloc[:0]
+    matches = parts.get('both', empty)
+    only_query1 = parts.get('left_only', empty)
+    only_query2 = parts.get('right_only', empty)
+    
+    # Compare values in matches (vectorized: one NumPy != over all columns
+    # at once instead of a Python loop per row and cell)
+    compare_cols = [col for col in common_columns if col not in join_keys]
+    mismatches = []
+    total_mismatches = 0
+    if compare_cols and not matches.empty:
+        # Build each suffixed column name exactly once
+        left_cols = [f"{col}_query1" for col in compare_cols]
+        right_cols = [f"{col}_query2" for col in compare_cols]
+        left = matches[left_cols].to_numpy()
+        right = matches[right_cols].to_numpy()
+        # Per-column dtype-aware comparison: numeric and datetime columns
+        # never pay the object -> str conversion
+        diff_mask = np.column_stack([
+            _column_diff_mask(matches[l], matches[r])
+            for l, r in zip(left_cols, right_cols)
+        ])
+        key_values = matches[join_keys].to_numpy()
+
+        mismatch_rows = np.flatnonzero(diff_mask.any(axis=1))
+        total_mismatches = int(mismatch_rows.size)
+
+        # Only build detail dicts for the rows the response actually shows;
+        # the summary reports the full count separately
+        for row_pos in mismatch_rows[:100]:
+            row_mismatches = {}
+            for col_pos in np.flatnonzero(diff_mask[row_pos]):
+                row_mismatches[compare_cols[col_pos]] = {
+                    "query1": left[row_pos, col_pos],
+                    "query2": right[row_pos, col_pos]
+                }
+            mismatches.append({
+                "key": dict(zip(join_keys, key_values[row_pos])),
+                "differences": row_mismatches
+            })
+    
+    execution_time = (datetime.now() - start_time).total_seconds()
+
+    # Project each category down to the columns the response needs before
+    # serializing: matched rows keep their keys plus both sides of every
+    # compared value column (the same record shape _compare_in_sql emits,
+    # and 'both' rows can still disagree on values); each only-* category
+    # keeps just the columns that originate in its own query, and _merge
+    # is dropped everywhere
+    match_cols = list(join_keys)
+    for col in compare_cols:
+        match_cols.append(f"{col}_query1")
+        match_cols.append(f"{col}_query2")
+    only1_cols = [c if c in merged.columns else f"{c}_query1" for c in df1.columns]
+    only2_cols = [c if c in merged.columns else f"{c}_query2"
+                  for c in df2_renamed.columns]
+
+    # Format results
+    return {
+        "summary": {
+            "total_rows_query1": len(df1),
+            "total_rows_query2": len(df2),
+            "matches": len(matches),
+            "only_in_query1": len(only_query1),
+            "only_in_query2": len(only_query2),
+            "mismatches": total_mismatches,
+            "truncated": len(df1) >= max_rows or len(df2) >= max_rows,
+            "execution_time": round(execution_time, 2)
+        },
+        "matches": matches.head(100)[match_cols].to_dict('records') if not matches.empty else [],
+        "only_in_query1": only_query1.head(100)[only1_cols].to_dict('records') if not only_query1.empty else [],
+        "only_in_query2": only_query2.head(100)[only2_cols].to_dict('records') if not only_query2.empty else [],
+        "mismatches": mismatches,
+        "columns": {
+            "query1": df1.columns.tolist(),
+            "query2": df2.columns.tolist(),
+            "mapped": common_columns
+        }
+    }
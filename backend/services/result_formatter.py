@@ -4,272 +4,137 @@ Handles formatting of comparison results for different output formats
 Supports JSON, CSV, Excel, and HTML report generation
 """
 
-import json
 import csv
 import io
+import itertools
+import math
+import openpyxl
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
-import html
 
+# Above this many total rows, to_excel hands off to the raw-XML writer
+# in to_excel_fast instead of going through openpyxl's cell model
+_EXCEL_FAST_ROW_THRESHOLD = 10_000
 
-class ResultFormatter:
-    """Format comparison results for various output formats"""
-    
-    @staticmethod
-    def format_for_display(comparison_result: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Format raw comparison results for frontend display
-        Handles data type serialization and null values
-        """
-        formatted = {
-            "summary": comparison_result.get("summary", {}),
-            "matches": [],
-            "only_in_query1": [],
-            "only_in_query2": [],
-            "mismatches": [],
-            "columns": comparison_result.get("columns", {})
-        }
-        
-        # Format matches - convert non-serializable types
-        for match in comparison_result.get("matches", []):
-            formatted_match = {}
-            for key, value in match.items():
-                formatted_match[key] = ResultFormatter._serialize_value(value)
-            formatted["matches"].append(formatted_match)
-        
-        # Format only_in_query1
-        for row in comparison_result.get("only_in_query1", []):
-            formatted_row = {}
-            for key, value in row.items():
-                formatted_row[key] = ResultFormatter._serialize_value(value)
-            formatted["only_in_query1"].append(formatted_row)
-        
-        # Format only_in_query2
-        for row in comparison_result.get("only_in_query2", []):
-            formatted_row = {}
-            for key, value in row.items():
-                formatted_row[key] = ResultFormatter._serialize_value(value)
-            formatted["only_in_query2"].append(formatted_row)
-        
-        # Format mismatches with detailed differences
-        for mismatch in comparison_result.get("mismatches", []):
-            formatted_mismatch = {
-                "key": {},
-                "differences": {}
-            }
-            
-            # Format key values
-            for key, value in mismatch.get("key", {}).items():
-                formatted_mismatch["key"][key] = ResultFormatter._serialize_value(value)
-            
-            # Format differences
-            for col, diff in mismatch.get("differences", {}).items():
-                formatted_mismatch["differences"][col] = {
-                    "query1": ResultFormatter._serialize_value(diff.get("query1")),
-                    "query2": ResultFormatter._serialize_value(diff.get("query2"))
-                }
-            
-            formatted["mismatches"].append(formatted_mismatch)
-        
-        return formatted
-    
-    @staticmethod
-    def _serialize_value(value: Any) -> Any:
-        """Convert non-serializable types to JSON-compatible formats"""
-        if value is None:
-            return None
-        elif isinstance(value, (datetime, pd.Timestamp)):
-            return value.isoformat()
-        elif isinstance(value, (pd.Int64Dtype, pd.Float64Dtype)):
-            return float(value) if hasattr(value, 'item') else value
-        elif hasattr(value, 'item'):  # numpy/pandas types
-            return value.item()
-        elif isinstance(value, (bytes, bytearray)):
-            return value.hex() if len(value) < 1000 else "[BINARY DATA]"
-        elif isinstance(value, dict):
-            return {k: ResultFormatter._serialize_value(v) for k, v in value.items()}
-        elif isinstance(value, (list, tuple)):
-            return [ResultFormatter._serialize_value(v) for v in value]
-        else:
-            return str(value) if not isinstance(value, (str, int, float, bool)) else value
+# Exact-type fast paths for _serialize_value: atomic values pass through
+# untouched and everything else resolves with one dict lookup instead of
+# walking an isinstance ladder per cell
+_ATOMIC_TYPES = {str, int, float, bool, type(None)}
 
-    @staticmethod
-    def to_json(comparison_result: Dict[str, Any], pretty: bool = True) -> str:
-        """Export comparison results as JSON"""
-        formatted = ResultFormatter.format_for_display(comparison_result)
-        
-        # Add metadata
-        output = {
-            "metadata": {
-                "generated_at": datetime.now().isoformat(),
-                "version": "1.0.0",
-                "type": "sql_comparison_result"
-            },
-            "data": formatted
-        }
-        
-        indent = 2 if pretty else None
-        return json.dumps(output, indent=indent, default=str)
-    
-    @staticmethod
-    def to_csv(comparison_result: Dict[str, Any]) -> Dict[str, str]:
-        """
-        Export comparison results as CSV files
-        Returns dictionary with CSV content for each category
-        """
-        formatted = ResultFormatter.format_for_display(comparison_result)
-        csv_outputs = {}
-        
-        # Export matches to CSV
-        if formatted["matches"]:
-            csv_outputs["matches"] = ResultFormatter._dicts_to_csv(
-                formatted["matches"], 
-                "matches.csv"
-            )
-        
-        # Export only_in_query1 to CSV
-        if formatted["only_in_query1"]:
-            csv_outputs["only_query1"] = ResultFormatter._dicts_to_csv(
-                formatted["only_in_query1"],
-                "only_query1.csv"
-            )
-        
-        # Export only_in_query2 to CSV
-        if formatted["only_in_query2"]:
-            csv_outputs["only_query2"] = ResultFormatter._dicts_to_csv(
-                formatted["only_in_query2"],
-                "only_query2.csv"
-            )
-        
-        # Export mismatches summary to CSV
-        if formatted["mismatches"]:
-            mismatch_rows = []
-            for mismatch in formatted["mismatches"]:
-                key_str = ", ".join([f"{k}={v}" for k, v in mismatch["key"].items()])
-                for col, diff in mismatch["differences"].items():
-                    mismatch_rows.append({
-                        "key": key_str,
-                        "column": col,
-                        "query1_value": diff["query1"],
-                        "query2_value": diff["query2"],
-                        "match_status": "MISMATCH"
-                    })
-            
-            if mismatch_rows:
-                csv_outputs["mismatches"] = ResultFormatter._dicts_to_csv(
-                    mismatch_rows,
-                    "mismatches.csv"
-                )
-        
-        # Export summary statistics
-        summary_rows = [{
-            "metric": k.replace("_", " ").title(),
-            "value": v
-        } for k, v in formatted["summary"].items()]
-        
-        csv_outputs["summary"] = ResultFormatter._dicts_to_csv(
-            summary_rows,
-            "summary.csv"
-        )
-        
-        return csv_outputs
-    
-    @staticmethod
-    def _dicts_to_csv(data: List[Dict], filename: str) -> Dict[str, str]:
-        """Convert list of dictionaries to CSV string"""
-        if not data:
-            return {"filename": filename, "content": ""}
-        
-        output = io.StringIO()
-        if data:
-            writer = csv.DictWriter(output, fieldnames=data[0].keys())
-            writer.writeheader()
-            writer.writerows(data)
-        
-        return {
-            "filename": filename,
-            "content": output.getvalue()
-        }
-    
-    @staticmethod
-    def to_excel(comparison_result: Dict[str, Any]) -> io.BytesIO:
-        """Export comparison results as Excel file with multiple sheets"""
-        formatted = ResultFormatter.format_for_display(comparison_result)
-        
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Summary sheet
-            summary_df = pd.DataFrame([
-                {"Metric": k.replace("_", " ").title(), "Value": v}
-                for k, v in formatted["summary"].items()
-            ])
-            summary_df.to_excel(writer, sheet_name="Summary", index=False)
-            
-            # Matches sheet
-            if formatted["matches"]:
-                matches_df = pd.DataFrame(formatted["matches"])
-                matches_df.to_excel(writer, sheet_name="Matches", index=False)
-            
-            # Only Query 1 sheet
-            if formatted["only_in_query1"]:
-                only1_df = pd.DataFrame(formatted["only_in_query1"])
-                only1_df.to_excel(writer, sheet_name="Only in Query 1", index=False)
-            
-            # Only Query 2 sheet
-            if formatted["only_in_query2"]:
-                only2_df = pd.DataFrame(formatted["only_in_query2"])
-                only2_df.to_excel(writer, sheet_name="Only in Query 2", index=False)
-            
-            # Mismatches sheet
-            if formatted["mismatches"]:
-                mismatch_rows = []
-                for mismatch in formatted["mismatches"]:
-                    key_str = ", ".join([f"{k}={v}" for k, v in mismatch["key"].items()])
-                    for col, diff in mismatch["differences"].items():
-                        mismatch_rows.append({
-                            "Key": key_str,
-                            "Column": col,
-                            "Query 1 Value": diff["query1"],
-                            "Query 2 Value": diff["query2"]
-                        })
-                
-                if mismatch_rows:
-                    mismatches_df = pd.DataFrame(mismatch_rows)
-                    mismatches_df.to_excel(writer, sheet_name="Mismatches", index=False)
-        
-        output.seek(0)
-        return output
-    
-    @staticmethod
-    def to_html_report(comparison_result: Dict[str, Any]) -> str:
-        """Generate HTML report for comparison results"""
-        formatted = ResultFormatter.format_for_display(comparison_result)
-        summary = formatted["summary"]
-        
-        # Color coding based on match percentage
-        total_rows = summary.get("total_rows_query1", 0) + summary.get("total_rows_query2", 0)
-        match_count = summary.get("matches", 0)
-        match_percentage = (match_count / total_rows * 100) if total_rows > 0 else 0
-        
-        if match_percentage >= 95:
-            status_color = "#28a745"  # Green
-            status_text = "Excellent"
-        elif match_percentage >= 80:
-            status_color = "#ffc107"  # Yellow
-            status_text = "Good"
-        else:
-            status_color = "#dc3545"  # Red
-            status_text = "Needs Review"
-        
-        html_template = f"""
+def _serialize_bytes(value):
+    return value.hex() if len(value) < 1000 else "[BINARY DATA]"
+
+_SERIALIZE_HANDLERS = {
+    datetime: lambda v: v.isoformat(),
+    pd.Timestamp: lambda v: v.isoformat(),
+    bytes: _serialize_bytes,
+    bytearray: _serialize_bytes,
+    dict: lambda v: {k: ResultFormatter._serialize_value(x) for k, x in v.items()},
+    list: lambda v: [ResultFormatter._serialize_value(x) for x in v],
+    tuple: lambda v: [ResultFormatter._serialize_value(x) for x in v],
+}
+
+# html.escape makes several str.replace passes per call; translate() with
+# a precomputed table does the same escaping in one C pass, which matters
+# in the per-cell report loops
+_HTML_ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+})
+
+def _esc(value) -> str:
+    return str(value).translate(_HTML_ESCAPE_TABLE)
+
+# Row template for the HTML mismatch table, compiled once at import so the
+# per-row loop only pays for format_map substitution
+_MISMATCH_ROW_TMPL = """
+                        <tr class="mismatch-row">
+                            <td><code>{key}</code></td>
+                            <td><strong>{col}</strong></td>
+                            <td style="color: #dc3545;"><code>{v1}</code></td>
+                            <td style="color: #28a745;"><code>{v2}</code></td>
+                        </tr>
+                    """
+
+# Static xlsx package parts shared by to_excel_fast. An .xlsx file is a
+# zip of XML parts; everything except the worksheets and the sheet lists
+# is identical for every export, so these are built once at import.
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheet_overrides}'
+    '</Types>'
+)
+_XLSX_SHEET_OVERRIDE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets>'
+    '</workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheet_rels}'
+    '<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_XLSX_SHEET_REL = (
+    '<Relationship Id="rId{n}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{n}.xml"/>'
+)
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font/></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+    '<cellXfs count="1"><xf/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_XLSX_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+_XLSX_SHEET_TAIL = '</sheetData></worksheet>'
+
+# The report's <head> (including the ~150-line stylesheet) is static
+# apart from the date, the status colour and the match percentage, so
+# it is frozen here as one %-template instead of being rebuilt as a
+# large f-string on every export
+_HTML_REPORT_HEAD = """
         <!DOCTYPE html>
         <html>
         <head>
             <meta charset="UTF-8">
-            <title>SQL Comparison Report - {datetime.now().strftime('%Y-%m-%d')}</title>
+            <title>SQL Comparison Report - %(report_date)s</title>
             <style>
-                body {{
+                body {
                     font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
                     line-height: 1.6;
                     color: #333;
@@ -277,137 +142,656 @@ class ResultFormatter:
                     margin: 0 auto;
                     padding: 20px;
                     background-color: #f5f7fa;
-                }}
-                .report-header {{
+                }
+                .report-header {
                     background-color: white;
                     padding: 30px;
                     border-radius: 8px;
                     box-shadow: 0 2px 4px rgba(0,0,0,0.1);
                     margin-bottom: 30px;
-                }}
-                h1 {{
+                }
+                h1 {
                     color: #1a2b3c;
                     margin: 0 0 10px 0;
                     border-bottom: 3px solid #28a745;
                     padding-bottom: 10px;
                     display: inline-block;
-                }}
-                .report-meta {{
+                }
+                .report-meta {
                     color: #6c757d;
                     font-size: 14px;
                     margin-top: 10px;
-                }}
-                .status-badge {{
+                }
+                .status-badge {
                     display: inline-block;
                     padding: 8px 16px;
                     border-radius: 20px;
                     font-weight: 600;
-                    background-color: {status_color};
+                    background-color: %(status_color)s;
                     color: white;
                     margin-left: 20px;
-                }}
-                .summary-cards {{
+                }
+                .summary-cards {
                     display: grid;
                     grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
                     gap: 20px;
                     margin-bottom: 30px;
-                }}
-                .card {{
+                }
+                .card {
                     background: white;
                     padding: 20px;
                     border-radius: 8px;
                     box-shadow: 0 2px 4px rgba(0,0,0,0.1);
                     border-left: 4px solid #28a745;
-                }}
-                .card.match {{ border-left-color: #28a745; }}
-                .card.mismatch {{ border-left-color: #dc3545; }}
-                .card.only1 {{ border-left-color: #fd7e14; }}
-                .card.only2 {{ border-left-color: #17a2b8; }}
-                .card-value {{
+                }
+                .card.match { border-left-color: #28a745; }
+                .card.mismatch { border-left-color: #dc3545; }
+                .card.only1 { border-left-color: #fd7e14; }
+                .card.only2 { border-left-color: #17a2b8; }
+                .card-value {
                     font-size: 32px;
                     font-weight: 700;
                     margin: 5px 0;
-                }}
-                .card-label {{
+                }
+                .card-label {
                     color: #6c757d;
                     font-size: 14px;
                     text-transform: uppercase;
                     letter-spacing: 0.5px;
-                }}
-                .section {{
+                }
+                .section {
                     background: white;
                     padding: 25px;
                     border-radius: 8px;
                     box-shadow: 0 2px 4px rgba(0,0,0,0.1);
                     margin-bottom: 30px;
-                }}
-                h2 {{
+                }
+                h2 {
                     color: #1a2b3c;
                     margin-top: 0;
                     margin-bottom: 20px;
                     font-size: 20px;
-                }}
-                table {{
-                    width: 100%;
+                }
+                table {
+                    width: 100%%;
                     border-collapse: collapse;
                     font-size: 14px;
-                }}
-                th {{
+                }
+                th {
                     background-color: #f8f9fa;
                     padding: 12px;
                     text-align: left;
                     font-weight: 600;
                     color: #495057;
                     border-bottom: 2px solid #dee2e6;
-                }}
-                td {{
+                }
+                td {
                     padding: 10px 12px;
                     border-bottom: 1px solid #e9ecef;
                     font-family: 'SF Mono', 'Menlo', monospace;
-                }}
-                tr:hover {{
+                }
+                tr:hover {
                     background-color: #f8f9fa;
-                }}
-                .mismatch-row {{
+                }
+                .mismatch-row {
                     background-color: #fff3e0;
-                }}
-                .match-highlight {{
+                }
+                .match-highlight {
                     background-color: #e8f5e9;
-                }}
-                .footer {{
+                }
+                .footer {
                     text-align: center;
                     color: #6c757d;
                     font-size: 12px;
                     margin-top: 40px;
                     padding-top: 20px;
                     border-top: 1px solid #dee2e6;
-                }}
-                .progress-bar {{
-                    width: 100%;
+                }
+                .progress-bar {
+                    width: 100%%;
                     height: 20px;
                     background-color: #e9ecef;
                     border-radius: 10px;
                     margin: 15px 0;
                     overflow: hidden;
-                }}
-                .progress-fill {{
-                    height: 100%;
-                    background-color: {status_color};
-                    width: {match_percentage}%;
+                }
+                .progress-fill {
+                    height: 100%%;
+                    background-color: %(status_color)s;
+                    width: %(match_percentage)s%%;
                     border-radius: 10px;
                     transition: width 0.3s ease;
-                }}
-                @media print {{
-                    body {{
+                }
+                @media print {
+                    body {
                         background-color: white;
-                    }}
-                    .card, .section {{
+                    }
+                    .card, .section {
                         box-shadow: none;
                         border: 1px solid #dee2e6;
-                    }}
-                }}
+                    }
+                }
             </style>
         </head>
+"""
+
+
+def _xlsx_cell(value):
+    """Render one worksheet cell: numeric <v>, boolean, or inline string"""
+    t = type(value)
+    if t is bool:
+        return '<c t="b"><v>%d</v></c>' % value
+    if t is int:
+        return '<c><v>%d</v></c>' % value
+    if t is float:
+        # NaN/inf are not representable in xlsx numeric cells
+        return '<c><v>%r</v></c>' % value if math.isfinite(value) else '<c/>'
+    if value is None:
+        return '<c/>'
+    return '<c t="inlineStr"><is><t>%s</t></is></c>' % _esc(value)
+
+
+class ResultFormatter:
+    """Format comparison results for various output formats"""
+    
+    @staticmethod
+    def format_for_display(comparison_result: Dict[str, Any],
+                           max_mismatches: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Format raw comparison results for frontend display
+        Handles data type serialization and null values
+
+        max_mismatches caps how many mismatches are formatted; emitters
+        that render only the first N pass their display limit so the rest
+        are never serialized. The summary's mismatch count is unaffected.
+        """
+        formatted = {
+            "summary": comparison_result.get("summary", {}),
+            "matches": [],
+            "only_in_query1": [],
+            "only_in_query2": [],
+            "mismatches": [],
+            "columns": comparison_result.get("columns", {})
+        }
+        
+        # Format the tabular categories column-at-a-time instead of one
+        # _serialize_value dispatch per cell
+        formatted["matches"] = ResultFormatter._format_rows(
+            comparison_result.get("matches", [])
+        )
+        formatted["only_in_query1"] = ResultFormatter._format_rows(
+            comparison_result.get("only_in_query1", [])
+        )
+        formatted["only_in_query2"] = ResultFormatter._format_rows(
+            comparison_result.get("only_in_query2", [])
+        )
+        
+        # Format mismatches with detailed differences; the dispatch and
+        # the result append are bound once outside the loop so each
+        # iteration is two dict comprehensions and one call
+        sv = ResultFormatter._serialize_value
+        append = formatted["mismatches"].append
+        for mismatch in itertools.islice(
+            comparison_result.get("mismatches", []), max_mismatches
+        ):
+            key = {k: sv(v) for k, v in mismatch.get("key", {}).items()}
+            append({
+                "key": key,
+                # Joined once here; every report emitter renders this
+                # string, so it is not rebuilt per output format. to_json
+                # strips it so it never leaks into the API payload.
+                "_key_str": ", ".join(f"{k}={v}" for k, v in key.items()),
+                "differences": {
+                    col: {"query1": sv(diff.get("query1")),
+                          "query2": sv(diff.get("query2"))}
+                    for col, diff in mismatch.get("differences", {}).items()
+                }
+            })
+
+        # Totals and status derived from the summary, shared by the HTML
+        # and Markdown emitters instead of each re-deriving them
+        formatted["_derived"] = ResultFormatter._derived_stats(formatted["summary"])
+
+        return formatted
+
+    @staticmethod
+    def _derived_stats(summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Compute the totals and status classification reports render"""
+        total_rows = (summary.get("total_rows_query1", 0)
+                      + summary.get("total_rows_query2", 0))
+        match_count = summary.get("matches", 0)
+        match_percentage = (match_count / total_rows * 100) if total_rows > 0 else 0
+
+        if match_percentage >= 95:
+            status_color = "#28a745"  # Green
+            status_text = "Excellent"
+        elif match_percentage >= 80:
+            status_color = "#ffc107"  # Yellow
+            status_text = "Good"
+        else:
+            status_color = "#dc3545"  # Red
+            status_text = "Needs Review"
+
+        return {
+            "total_rows": total_rows,
+            "match_percentage": match_percentage,
+            "status_color": status_color,
+            "status_text": status_text,
+        }
+    
+    @staticmethod
+    def _format_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Serialize a list of record dicts column-at-a-time via pandas
+
+        Typed columns (numeric, bool, datetime) are converted with
+        vectorized C operations; only object columns still go through the
+        per-cell _serialize_value dispatch. Numeric columns unbox through
+        ndarray.tolist(), which produces native Python scalars in a
+        single C call instead of boxing one numpy scalar per cell.
+        """
+        if not rows:
+            return []
+
+        # The record dicts share one key set, so the column order comes
+        # from the first row and from_records gets plain tuples; that
+        # skips the per-dict key-union scan DataFrame(list_of_dicts) runs,
+        # and coerce_float=False keeps ints from widening to float64
+        names = list(rows[0].keys())
+        df = pd.DataFrame.from_records(
+            [tuple(row.get(c) for c in names) for row in rows],
+            columns=names,
+            coerce_float=False
+        )
+        cols = []
+        for name in names:
+            series = df[name]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                # isoformat keeps sub-second precision when present, the
+                # same rendering _serialize_value gives mismatch details
+                values = ResultFormatter._tolist_with_none(
+                    series.map(pd.Timestamp.isoformat, na_action='ignore')
+                )
+            elif series.dtype == object:
+                values = ResultFormatter._tolist_with_none(
+                    series.map(ResultFormatter._serialize_value)
+                )
+            elif series.dtype.kind in 'iufb':
+                values = series.to_numpy().tolist()
+                if series.hasnans:
+                    values = [None if isna else v for v, isna
+                              in zip(values, series.isna().tolist())]
+            else:
+                values = ResultFormatter._tolist_with_none(
+                    series.astype(object)
+                )
+            cols.append(values)
+
+        return [dict(zip(names, row)) for row in zip(*cols)]
+
+    @staticmethod
+    def _tolist_with_none(series: pd.Series) -> List[Any]:
+        """Unbox a series to a plain list with NaN/NaT mapped to None"""
+        values = series.tolist()
+        if series.hasnans:
+            values = [None if isna else v for v, isna
+                      in zip(values, series.isna().tolist())]
+        return values
+
+    @staticmethod
+    def _serialize_value(value: Any) -> Any:
+        """Convert non-serializable types to JSON-compatible formats"""
+        t = type(value)
+        if t in _ATOMIC_TYPES:
+            return value
+
+        handler = _SERIALIZE_HANDLERS.get(t)
+        if handler is not None:
+            return handler(value)
+
+        # Rarer types fall through to the slower checks: numpy/pandas
+        # scalars unbox via item(), subclasses of the handled types still
+        # serialize correctly, anything else becomes its str()
+        if hasattr(value, 'item'):
+            return value.item()
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (bytes, bytearray)):
+            return _serialize_bytes(value)
+        if isinstance(value, dict):
+            return {k: ResultFormatter._serialize_value(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [ResultFormatter._serialize_value(v) for v in value]
+        return str(value)
+
+    @staticmethod
+    def to_json(comparison_result: Dict[str, Any], pretty: bool = True,
+                _preformatted: Optional[Dict[str, Any]] = None) -> str:
+        """Export comparison results as JSON"""
+        # orjson encodes datetimes and numpy scalars natively in C, so the
+        # raw result can be serialized without a format_for_display walk;
+        # a preformatted dict is reused when the caller already built one
+        data = _preformatted if _preformatted is not None else comparison_result
+
+        # The precomputed _key_str and _derived entries are report
+        # rendering artifacts and must not leak into the JSON payload
+        mismatches = data.get("mismatches")
+        strip_keys = mismatches and "_key_str" in mismatches[0]
+        if strip_keys or "_derived" in data:
+            data = dict(data)
+            data.pop("_derived", None)
+            if strip_keys:
+                data["mismatches"] = [
+                    {k: v for k, v in m.items() if k != "_key_str"}
+                    for m in mismatches
+                ]
+
+        output = {
+            "metadata": {
+                "generated_at": datetime.now().isoformat(),
+                "version": "1.0.0",
+                "type": "sql_comparison_result"
+            },
+            "data": data
+        }
+
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(
+            output, option=option, default=ResultFormatter._serialize_value
+        ).decode()
+    
+    @staticmethod
+    def _make_column_serializers(sample_row: Dict[str, Any]) -> Dict[str, Any]:
+        """Choose one serializer per column from a sample row
+
+        csv.writer stringifies primitives itself, so atomic columns get a
+        pass-through (None). Datetime and bytes columns bind their handler
+        once here; only columns of unrecognized type keep the full
+        per-cell _serialize_value dispatch.
+        """
+        serializers = {}
+        for col, value in sample_row.items():
+            t = type(value)
+            if t in _ATOMIC_TYPES:
+                serializers[col] = None
+            elif t is datetime or t is pd.Timestamp:
+                serializers[col] = (
+                    lambda v: v.isoformat() if isinstance(v, datetime) else v
+                )
+            elif t is bytes or t is bytearray:
+                serializers[col] = _serialize_bytes
+            else:
+                serializers[col] = ResultFormatter._serialize_value
+        return serializers
+
+    @staticmethod
+    def to_csv(comparison_result: Dict[str, Any],
+               _preformatted: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        Export comparison results as CSV files
+        Returns dictionary with CSV content for each category
+        """
+        # CSV needs no display formatting of its own, so without a shared
+        # preformatted dict this path streams the raw result directly:
+        # each column's serializer is picked once from a sample row rather
+        # than running a full format_for_display pass first
+        already_formatted = _preformatted is not None
+        source = _preformatted if already_formatted else comparison_result
+        csv_outputs = {}
+
+        # Export the tabular categories: positional tuples straight into
+        # csv.writer, no per-row fieldname lookups
+        for out_key, result_key, filename in (
+            ("matches", "matches", "matches.csv"),
+            ("only_query1", "only_in_query1", "only_query1.csv"),
+            ("only_query2", "only_in_query2", "only_query2.csv")
+        ):
+            rows = source.get(result_key, [])
+            if rows:
+                header = list(rows[0].keys())
+                if already_formatted:
+                    row_iter = ([row.get(c) for c in header] for row in rows)
+                else:
+                    cells = [
+                        (c, s) for c, s in
+                        ResultFormatter._make_column_serializers(rows[0]).items()
+                        if c in header
+                    ]
+                    row_iter = (
+                        [row.get(c) if s is None else s(row.get(c))
+                         for c, s in cells]
+                        for row in rows
+                    )
+                csv_outputs[out_key] = ResultFormatter._records_to_csv(
+                    header, row_iter, filename
+                )
+
+        # Export mismatches summary to CSV, yielding tuples directly
+        # instead of building an intermediate dict list
+        mismatches = source.get("mismatches", [])
+        if mismatches:
+            sv = ((lambda v: v) if already_formatted
+                  else ResultFormatter._serialize_value)
+
+            def mismatch_rows():
+                for mismatch in mismatches:
+                    key_str = mismatch.get("_key_str") or ", ".join(
+                        f"{k}={sv(v)}" for k, v in mismatch["key"].items()
+                    )
+                    for col, diff in mismatch["differences"].items():
+                        yield (key_str, col, sv(diff["query1"]),
+                               sv(diff["query2"]), "MISMATCH")
+
+            csv_outputs["mismatches"] = ResultFormatter._records_to_csv(
+                ["key", "column", "query1_value", "query2_value", "match_status"],
+                mismatch_rows(),
+                "mismatches.csv"
+            )
+
+        # Export summary statistics
+        csv_outputs["summary"] = ResultFormatter._records_to_csv(
+            ["metric", "value"],
+            ((k.replace("_", " ").title(), v)
+             for k, v in source.get("summary", {}).items()),
+            "summary.csv"
+        )
+
+        return csv_outputs
+
+    @staticmethod
+    def _records_to_csv(header: List[str], rows: Any, filename: str) -> Dict[str, str]:
+        """Write a header and an iterable of row tuples as a CSV string"""
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+        return {
+            "filename": filename,
+            "content": output.getvalue()
+        }
+    
+    @staticmethod
+    def to_excel(comparison_result: Dict[str, Any],
+                 _preformatted: Optional[Dict[str, Any]] = None) -> io.BytesIO:
+        """Export comparison results as Excel file with multiple sheets"""
+        formatted = _preformatted or ResultFormatter.format_for_display(comparison_result)
+
+        # Very large exports skip openpyxl entirely and go through the
+        # raw-XML writer, which streams rows without per-cell objects
+        total_rows = (len(formatted["matches"])
+                      + len(formatted["only_in_query1"])
+                      + len(formatted["only_in_query2"])
+                      + len(formatted["mismatches"]))
+        if total_rows >= _EXCEL_FAST_ROW_THRESHOLD:
+            return ResultFormatter.to_excel_fast(
+                comparison_result, _preformatted=formatted
+            )
+
+        # Write-only workbook appends plain tuples per row, bypassing both
+        # the intermediate DataFrame per sheet and openpyxl's Cell-object
+        # construction per value
+        wb = openpyxl.Workbook(write_only=True)
+
+        # Summary sheet
+        ws = wb.create_sheet("Summary")
+        ws.append(["Metric", "Value"])
+        for k, v in formatted["summary"].items():
+            ws.append([k.replace("_", " ").title(), v])
+
+        # One sheet per tabular category
+        for title, rows in (
+            ("Matches", formatted["matches"]),
+            ("Only in Query 1", formatted["only_in_query1"]),
+            ("Only in Query 2", formatted["only_in_query2"])
+        ):
+            if rows:
+                ws = wb.create_sheet(title)
+                header = list(rows[0].keys())
+                ws.append(header)
+                for row in rows:
+                    ws.append(tuple(row.get(c) for c in header))
+
+        # Mismatches sheet
+        if formatted["mismatches"]:
+            ws = wb.create_sheet("Mismatches")
+            ws.append(["Key", "Column", "Query 1 Value", "Query 2 Value"])
+            for mismatch in formatted["mismatches"]:
+                key_str = mismatch["_key_str"]
+                for col, diff in mismatch["differences"].items():
+                    ws.append((key_str, col, diff["query1"], diff["query2"]))
+
+        # Pre-size the buffer from a rough rows x cols estimate so BytesIO
+        # does not repeatedly grow-and-memcpy while the zip is written;
+        # the unused tail is truncated after the save
+        estimated = 1024
+        for rows in (formatted["matches"], formatted["only_in_query1"],
+                     formatted["only_in_query2"]):
+            if rows:
+                estimated += len(rows) * len(rows[0]) * 16
+        estimated += len(formatted["mismatches"]) * 4 * 16
+
+        output = io.BytesIO(bytes(estimated))
+        output.seek(0)
+        wb.save(output)
+        output.truncate()
+        output.seek(0)
+        return output
+
+    @staticmethod
+    def to_excel_fast(comparison_result: Dict[str, Any],
+                      _preformatted: Optional[Dict[str, Any]] = None) -> io.BytesIO:
+        """Export comparison results as Excel by writing the xlsx XML directly
+
+        An .xlsx file is a zip of XML parts, and flat tabular sheets need
+        none of openpyxl's cell model: each worksheet's <sheetData> is
+        streamed straight into a deflated ZipFile with inline strings,
+        while the boilerplate package parts come from static templates.
+        Produces the same sheets as to_excel.
+        """
+        formatted = _preformatted or ResultFormatter.format_for_display(comparison_result)
+
+        # (title, header, iterable of row tuples), in sheet order
+        sheets = [(
+            "Summary",
+            ["Metric", "Value"],
+            [(k.replace("_", " ").title(), v)
+             for k, v in formatted["summary"].items()]
+        )]
+        for title, rows in (
+            ("Matches", formatted["matches"]),
+            ("Only in Query 1", formatted["only_in_query1"]),
+            ("Only in Query 2", formatted["only_in_query2"])
+        ):
+            if rows:
+                header = list(rows[0].keys())
+                sheets.append((
+                    title, header,
+                    ([row.get(c) for c in header] for row in rows)
+                ))
+        if formatted["mismatches"]:
+            def mismatch_rows():
+                for mismatch in formatted["mismatches"]:
+                    key_str = mismatch["_key_str"]
+                    for col, diff in mismatch["differences"].items():
+                        yield (key_str, col, diff["query1"], diff["query2"])
+
+            sheets.append((
+                "Mismatches",
+                ["Key", "Column", "Query 1 Value", "Query 2 Value"],
+                mismatch_rows()
+            ))
+
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES.format(
+                sheet_overrides="".join(
+                    _XLSX_SHEET_OVERRIDE.format(n=n)
+                    for n in range(1, len(sheets) + 1)
+                )
+            ))
+            zf.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+            zf.writestr("xl/workbook.xml", _XLSX_WORKBOOK.format(
+                sheets="".join(
+                    f'<sheet name="{_esc(title)}" sheetId="{n}" r:id="rId{n}"/>'
+                    for n, (title, _, _) in enumerate(sheets, 1)
+                )
+            ))
+            zf.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS.format(
+                sheet_rels="".join(
+                    _XLSX_SHEET_REL.format(n=n)
+                    for n in range(1, len(sheets) + 1)
+                )
+            ))
+            zf.writestr("xl/styles.xml", _XLSX_STYLES)
+
+            cell = _xlsx_cell
+            for n, (title, header, rows) in enumerate(sheets, 1):
+                buf = io.StringIO()
+                w = buf.write
+                w(_XLSX_SHEET_HEAD)
+                w("<row>")
+                for name in header:
+                    w(cell(name))
+                w("</row>")
+                for row in rows:
+                    w("<row>")
+                    for value in row:
+                        w(cell(value))
+                    w("</row>")
+                w(_XLSX_SHEET_TAIL)
+                zf.writestr(f"xl/worksheets/sheet{n}.xml", buf.getvalue())
+
+        output.seek(0)
+        return output
+
+    @staticmethod
+    def to_html_report(comparison_result: Dict[str, Any],
+                       _preformatted: Optional[Dict[str, Any]] = None) -> str:
+        """Generate HTML report for comparison results"""
+        # The report only renders the first 50 mismatches, so the rest are
+        # never formatted when this emitter builds its own dict
+        formatted = _preformatted or ResultFormatter.format_for_display(
+            comparison_result, max_mismatches=50
+        )
+        summary = formatted["summary"]
+
+        derived = formatted.get("_derived") or ResultFormatter._derived_stats(summary)
+        total_rows = derived["total_rows"]
+        match_count = summary.get("matches", 0)
+        match_percentage = derived["match_percentage"]
+        status_color = derived["status_color"]
+        status_text = derived["status_text"]
+
+        buf = io.StringIO()
+        w = buf.write
+        w(_HTML_REPORT_HEAD % {
+            "report_date": datetime.now().strftime('%Y-%m-%d'),
+            "status_color": status_color,
+            "match_percentage": match_percentage,
+        })
+        w(f"""
         <body>
             <div class="report-header">
                 <h1>SQL Query Comparison Report</h1>
@@ -486,11 +870,11 @@ class ResultFormatter:
                     </tbody>
                 </table>
             </div>
-        """
-        
+        """)
+
         # Add mismatches section if any exist
         if formatted["mismatches"]:
-            html_template += """
+            w("""
             <div class="section">
                 <h2>⚠ Value Mismatches</h2>
                 <table>
@@ -503,97 +887,102 @@ class ResultFormatter:
                         </tr>
                     </thead>
                     <tbody>
-            """
-            
+            """)
+
             for mismatch in formatted["mismatches"][:50]:  # Limit to first 50 mismatches
-                key_str = ", ".join([f"{k}={v}" for k, v in mismatch["key"].items()])
+                # Escape the precomputed key once per mismatch, not once
+                # per column
+                esc_key = _esc(mismatch["_key_str"])
                 for col, diff in mismatch["differences"].items():
-                    html_template += f"""
-                        <tr class="mismatch-row">
-                            <td><code>{html.escape(key_str)}</code></td>
-                            <td><strong>{html.escape(col)}</strong></td>
-                            <td style="color: #dc3545;"><code>{html.escape(str(diff['query1']))}</code></td>
-                            <td style="color: #28a745;"><code>{html.escape(str(diff['query2']))}</code></td>
-                        </tr>
-                    """
-            
-            html_template += """
+                    w(_MISMATCH_ROW_TMPL.format_map({
+                        "key": esc_key,
+                        "col": _esc(col),
+                        "v1": _esc(diff['query1']),
+                        "v2": _esc(diff['query2'])
+                    }))
+
+            w("""
                     </tbody>
                 </table>
-            """
-            
-            if len(formatted["mismatches"]) > 50:
-                html_template += f"""
+            """)
+
+            total_mismatches = summary.get("mismatches", len(formatted["mismatches"]))
+            if total_mismatches > 50:
+                w(f"""
                 <p style="color: #6c757d; margin-top: 15px;">
-                    * Showing first 50 of {len(formatted['mismatches'])} mismatches
+                    * Showing first 50 of {total_mismatches} mismatches
                 </p>
-                """
-            
-            html_template += "</div>"
+                """)
+
+            w("</div>")
         
         # Add matches preview if any exist
         if formatted["matches"]:
-            html_template += """
+            w("""
             <div class="section">
                 <h2>✓ Matching Rows Preview</h2>
                 <table>
                     <thead>
                         <tr>
-            """
-            
+            """)
+
             # Add table headers
-            if formatted["matches"]:
-                for col in formatted["matches"][0].keys():
-                    html_template += f"<th>{html.escape(str(col))}</th>"
-            
-            html_template += """
+            for col in formatted["matches"][0].keys():
+                w(f"<th>{_esc(col)}</th>")
+
+            w("""
                         </tr>
                     </thead>
                     <tbody>
-            """
-            
+            """)
+
             # Add first 20 matches
             for match in formatted["matches"][:20]:
-                html_template += "<tr>"
+                w("<tr>")
                 for value in match.values():
-                    html_template += f"<td><code>{html.escape(str(value))}</code></td>"
-                html_template += "</tr>"
-            
-            html_template += """
+                    w(f"<td><code>{_esc(value)}</code></td>")
+                w("</tr>")
+
+            w("""
                     </tbody>
                 </table>
-            """
-            
+            """)
+
             if len(formatted["matches"]) > 20:
-                html_template += f"""
+                w(f"""
                 <p style="color: #6c757d; margin-top: 15px;">
                     * Showing first 20 of {len(formatted['matches'])} matching rows
                 </p>
-                """
-            
-            html_template += "</div>"
-        
+                """)
+
+            w("</div>")
+
         # Close HTML
-        html_template += """
+        w("""
             <div class="footer">
                 <p>Generated by SQL Query Comparison Tool v1.0.0</p>
                 <p>Report includes all comparison results and detailed mismatch analysis</p>
             </div>
         </body>
         </html>
-        """
-        
-        return html_template
+        """)
+
+        return buf.getvalue()
     
     @staticmethod
-    def to_markdown(comparison_result: Dict[str, Any]) -> str:
+    def to_markdown(comparison_result: Dict[str, Any],
+                    _preformatted: Optional[Dict[str, Any]] = None) -> str:
         """Generate Markdown report for documentation"""
-        formatted = ResultFormatter.format_for_display(comparison_result)
+        # Only the first 20 mismatches appear in the report, so formatting
+        # stops there when this emitter builds its own dict
+        formatted = _preformatted or ResultFormatter.format_for_display(
+            comparison_result, max_mismatches=20
+        )
         summary = formatted["summary"]
-        
-        total_rows = summary.get("total_rows_query1", 0) + summary.get("total_rows_query2", 0)
-        match_percentage = (summary.get("matches", 0) / total_rows * 100) if total_rows > 0 else 0
-        
+
+        derived = formatted.get("_derived") or ResultFormatter._derived_stats(summary)
+        match_percentage = derived["match_percentage"]
+
         md = []
         md.append("# SQL Query Comparison Report")
         md.append("")
@@ -621,7 +1010,11 @@ class ResultFormatter:
             md.append("")
             
             for i, mismatch in enumerate(formatted["mismatches"][:20], 1):
-                key_str = ", ".join([f"**{k}**={v}" for k, v in mismatch["key"].items()])
+                # Markdown keeps its own join: the headings bold each key
+                # name, which the shared plain _key_str cannot express
+                key_str = ", ".join(
+                    f"**{k}**={v}" for k, v in mismatch["key"].items()
+                )
                 md.append(f"### Mismatch {i}: {key_str}")
                 md.append("")
                 md.append("| Column | Query 1 Value | Query 2 Value |")
@@ -632,8 +1025,9 @@ class ResultFormatter:
                 
                 md.append("")
             
-            if len(formatted["mismatches"]) > 20:
-                md.append(f"*... and {len(formatted['mismatches']) - 20} more mismatches*")
+            total_mismatches = summary.get("mismatches", len(formatted["mismatches"]))
+            if total_mismatches > 20:
+                md.append(f"*... and {total_mismatches - 20} more mismatches*")
                 md.append("")
         
         # Column mappings
@@ -670,78 +1064,114 @@ class ComparisonReportGenerator:
     def __init__(self, comparison_result: Dict[str, Any]):
         self.result = comparison_result
         self.formatter = ResultFormatter
-    
+        self._formatted: Optional[Dict[str, Any]] = None
+
+    @property
+    def formatted(self) -> Dict[str, Any]:
+        """Display-formatted result, computed once and shared by emitters"""
+        if self._formatted is None:
+            self._formatted = ResultFormatter.format_for_display(self.result)
+        return self._formatted
+
     def generate_report_package(self) -> Dict[str, Any]:
         """Generate all report formats in one package"""
-        return {
-            "json": self.formatter.to_json(self.result),
-            "csv": self.formatter.to_csv(self.result),
-            "excel": self.formatter.to_excel(self.result),
-            "html": self.formatter.to_html_report(self.result),
-            "markdown": self.formatter.to_markdown(self.result),
-            "metadata": {
-                "generated_at": datetime.now().isoformat(),
-                "row_count": {
-                    "matches": len(self.result.get("matches", [])),
-                    "mismatches": len(self.result.get("mismatches", [])),
-                    "only_query1": len(self.result.get("only_in_query1", [])),
-                    "only_query2": len(self.result.get("only_in_query2", []))
-                }
+        formatted = self.formatted
+
+        # The emitters only read the shared preformatted dict, and the
+        # zip/C-encoder portions (xlsx deflate, orjson) release the GIL,
+        # so running them on threads overlaps real work
+        emitters = {
+            "json": self.formatter.to_json,
+            "csv": self.formatter.to_csv,
+            "excel": self.formatter.to_excel,
+            "html": self.formatter.to_html_report,
+            "markdown": self.formatter.to_markdown
+        }
+        with ThreadPoolExecutor(max_workers=len(emitters)) as executor:
+            futures = {
+                fmt: executor.submit(emit, self.result, _preformatted=formatted)
+                for fmt, emit in emitters.items()
+            }
+            package = {fmt: future.result() for fmt, future in futures.items()}
+
+        package["metadata"] = {
+            "generated_at": datetime.now().isoformat(),
+            "row_count": {
+                "matches": len(self.result.get("matches", [])),
+                "mismatches": len(self.result.get("mismatches", [])),
+                "only_query1": len(self.result.get("only_in_query1", [])),
+                "only_query2": len(self.result.get("only_in_query2", []))
             }
         }
-    
+        return package
+
     def save_report(self, output_dir: str, formats: List[str] = None) -> Dict[str, str]:
         """Save reports to files"""
         import os
-        
+
         if formats is None:
             formats = ["json", "csv", "html", "markdown"]
-        
+
         os.makedirs(output_dir, exist_ok=True)
         saved_files = {}
-        
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        if "json" in formats:
-            json_content = self.formatter.to_json(self.result)
-            filename = f"comparison_report_{timestamp}.json"
+
+        formatted = self.formatted
+
+        def write_file(filename: str, payload) -> str:
+            # Raw descriptor writes: the reports are already complete
+            # in-memory strings/buffers, so each file is one encode and
+            # one write with no TextIOWrapper buffering layer in between
             filepath = os.path.join(output_dir, filename)
-            with open(filepath, "w") as f:
-                f.write(json_content)
-            saved_files["json"] = filepath
-        
+            if isinstance(payload, str):
+                payload = payload.encode("utf-8")
+            # O_BINARY keeps the Windows CRT from translating newline
+            # bytes, which would corrupt the xlsx zip stream; it does not
+            # exist on POSIX, hence the getattr
+            flags = (os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+                     | getattr(os, "O_BINARY", 0))
+            fd = os.open(filepath, flags, 0o644)
+            try:
+                view = memoryview(payload)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            return filepath
+
+        if "json" in formats:
+            saved_files["json"] = write_file(
+                f"comparison_report_{timestamp}.json",
+                self.formatter.to_json(self.result, _preformatted=formatted)
+            )
+
         if "csv" in formats:
-            csv_files = self.formatter.to_csv(self.result)
+            csv_files = self.formatter.to_csv(self.result, _preformatted=formatted)
             for key, csv_data in csv_files.items():
                 if csv_data.get("content"):
-                    filename = f"{key}_{timestamp}.csv"
-                    filepath = os.path.join(output_dir, filename)
-                    with open(filepath, "w", newline="") as f:
-                        f.write(csv_data["content"])
-                    saved_files[f"csv_{key}"] = filepath
-        
+                    saved_files[f"csv_{key}"] = write_file(
+                        f"{key}_{timestamp}.csv", csv_data["content"]
+                    )
+
         if "excel" in formats:
-            excel_content = self.formatter.to_excel(self.result)
-            filename = f"comparison_report_{timestamp}.xlsx"
-            filepath = os.path.join(output_dir, filename)
-            with open(filepath, "wb") as f:
-                f.write(excel_content.getvalue())
-            saved_files["excel"] = filepath
-        
+            # getbuffer() hands the BytesIO's memory to os.write without
+            # the copy getvalue() would make
+            excel_content = self.formatter.to_excel(self.result, _preformatted=formatted)
+            saved_files["excel"] = write_file(
+                f"comparison_report_{timestamp}.xlsx", excel_content.getbuffer()
+            )
+
         if "html" in formats:
-            html_content = self.formatter.to_html_report(self.result)
-            filename = f"comparison_report_{timestamp}.html"
-            filepath = os.path.join(output_dir, filename)
-            with open(filepath, "w") as f:
-                f.write(html_content)
-            saved_files["html"] = filepath
-        
+            saved_files["html"] = write_file(
+                f"comparison_report_{timestamp}.html",
+                self.formatter.to_html_report(self.result, _preformatted=formatted)
+            )
+
         if "markdown" in formats:
-            md_content = self.formatter.to_markdown(self.result)
-            filename = f"comparison_report_{timestamp}.md"
-            filepath = os.path.join(output_dir, filename)
-            with open(filepath, "w") as f:
-                f.write(md_content)
-            saved_files["markdown"] = filepath
-        
+            saved_files["markdown"] = write_file(
+                f"comparison_report_{timestamp}.md",
+                self.formatter.to_markdown(self.result, _preformatted=formatted)
+            )
+
         return saved_files
\ No newline at end of file
@@ -0,0 +1,28 @@
+import base64
+import hashlib
+from cryptography.fernet import Fernet, InvalidToken
+from config import Config
+
+# Marks encrypted values so plain ones from older sessions still work
+_PREFIX = 'fernet:'
+
+def _fernet():
+    """Build a Fernet instance keyed off the app SECRET_KEY"""
+    key = hashlib.sha256(Config.SECRET_KEY.encode()).digest()
+    return Fernet(base64.urlsafe_b64encode(key))
+
+def encrypt_password(password):
+    """Encrypt a password for storage in the client-side session cookie"""
+    return _PREFIX + _fernet().encrypt(password.encode()).decode()
+
+def decrypt_password(value):
+    """Decrypt a password produced by encrypt_password
+
+    Values without the encryption prefix are passed through unchanged.
+    """
+    if not isinstance(value, str) or not value.startswith(_PREFIX):
+        return value
+    try:
+        return _fernet().decrypt(value[len(_PREFIX):].encode()).decode()
+    except InvalidToken:
+        raise Exception("Connection failed: stored credentials are invalid")
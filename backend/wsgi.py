@@ -0,0 +1,9 @@
+"""WSGI entry point for production servers
+
+Run with threaded workers so pyodbc's GIL-releasing ODBC calls overlap
+across concurrent requests and the in-process connection pool is shared
+within each worker:
+
+    gunicorn -k gthread -w 2 --threads 8 -b 0.0.0.0:5000 wsgi:application
+"""
+from app import app as application